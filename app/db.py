@@ -2,23 +2,94 @@ from __future__ import annotations
 
 import os
 import sqlite3
-from typing import Iterator
+from typing import Iterator, Optional
 
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 from sqlmodel import SQLModel, Session, create_engine
 
 # Персистентный путь к БД (маппится на /data в docker-compose)
 DB_PATH = os.environ.get("DB_PATH", "/data/people.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+# Обычный пул: запись сериализуют сам SQLite (WAL) и busy_timeout
 engine = create_engine(
     f"sqlite:///{DB_PATH}",
     connect_args={"check_same_thread": False},
+    pool_recycle=3600,
     pool_pre_ping=True,
 )
 
+# Читатели (список, карточка) — отдельный read-only пул: в WAL они не ждут писателя
+engine_ro = create_engine(
+    f"sqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=8,
+    max_overflow=0,
+    pool_recycle=3600,
+)
+
+
+# Настройки SQLite на каждое новое соединение пула.
+# Только для писателя (меняют файл/режим записи): WAL + NORMAL — меньше fsync на коммит
+_WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+)
+# Для обоих пулов: кэш 16 МБ, mmap 256 МБ, temp в памяти, ожидание блокировки
+_COMMON_PRAGMAS = (
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _unicode_lower(value: Optional[str]) -> str:
+    return (value or "").lower()
+
+
+def _register_functions(dbapi_conn: sqlite3.Connection) -> None:
+    # Встроенные lower()/NOCASE в SQLite понимают только ASCII, а имена у нас кириллицей
+    dbapi_conn.create_function("unicode_lower", 1, _unicode_lower, deterministic=True)
+
+
+def _apply_pragmas(dbapi_conn: sqlite3.Connection, pragmas: tuple[str, ...]) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        for pragma in pragmas:
+            cur.execute(pragma)
+    finally:
+        cur.close()
 
-def _pragma_foreign_keys(conn: sqlite3.Connection) -> None:
-    conn.execute("PRAGMA foreign_keys=ON")
+
+@event.listens_for(engine, "connect")
+def _init_connection(dbapi_conn: sqlite3.Connection, _record) -> None:
+    _register_functions(dbapi_conn)
+    _apply_pragmas(dbapi_conn, _WRITER_PRAGMAS + _COMMON_PRAGMAS)
+
+
+@event.listens_for(engine_ro, "connect")
+def _init_connection_ro(dbapi_conn: sqlite3.Connection, _record) -> None:
+    _register_functions(dbapi_conn)
+    _apply_pragmas(dbapi_conn, _COMMON_PRAGMAS)
+
+
+@event.listens_for(engine, "close")
+def _optimize_on_close(dbapi_conn: sqlite3.Connection, _record) -> None:
+    # Рекомендация SQLite: PRAGMA optimize перед закрытием соединения
+    try:
+        dbapi_conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+
+
+def optimize_db() -> None:
+    # Обновляет статистику планировщика только там, где она устарела
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
 
 
 def init_db() -> None:
@@ -26,10 +97,6 @@ def init_db() -> None:
 
     # Ленивая миграция: добавляем недостающие колонки в person
     with engine.begin() as conn:
-        raw = conn.connection
-        if isinstance(raw, sqlite3.Connection):
-            _pragma_foreign_keys(raw)
-
         cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(person)")}
 
         desired = [
@@ -63,11 +130,50 @@ def init_db() -> None:
             ("notify_year_7d", "INTEGER"),
             ("notify_year_1d", "INTEGER"),
         ]
-        for col, typ in desired:
-            if col not in cols:
-                conn.exec_driver_sql(f"ALTER TABLE person ADD COLUMN {col} {typ}")
+        alters = [
+            f"ALTER TABLE person ADD COLUMN {col} {typ}"
+            for col, typ in desired
+            if col not in cols
+        ]
+        if alters:
+            # Все ALTER одним скриптом и одной транзакцией: схема меняется разом
+            conn.connection.executescript("BEGIN; " + "; ".join(alters) + "; COMMIT;")
+
+        # Раньше пути хранились как "/uploads/<имя>" — оставляем только имя файла
+        conn.exec_driver_sql(
+            "UPDATE person SET avatar_path = substr(avatar_path, 10)"
+            " WHERE avatar_path LIKE '/uploads/%'"
+        )
+        conn.exec_driver_sql(
+            "UPDATE pet SET photo_path = substr(photo_path, 10)"
+            " WHERE photo_path LIKE '/uploads/%'"
+        )
+
+        # Индексы под выборки и сортировки (ДР в наблюдателе, карточка человека)
+        for ddl in (
+            "CREATE INDEX IF NOT EXISTS ix_person_bmonth_bday ON person(birth_month, birth_day)",
+            "CREATE INDEX IF NOT EXISTS ix_pet_person_sort ON pet(person_id, species, name)",
+            "CREATE INDEX IF NOT EXISTS ix_note_person_created ON note(person_id, created_at DESC)",
+        ):
+            conn.exec_driver_sql(ddl)
+
+        # Первичный сбор статистики для планировщика. Флаг 0x10000 (анализ всех
+        # таблиц на свежем соединении) есть только с SQLite 3.46 — на старых
+        # версиях делаем ANALYZE, пока статистики ещё нет
+        if sqlite3.sqlite_version_info >= (3, 46):
+            conn.exec_driver_sql("PRAGMA optimize=0x10002")
+        else:
+            has_stats = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).first() and conn.exec_driver_sql("SELECT 1 FROM sqlite_stat1 LIMIT 1").first()
+            conn.exec_driver_sql("PRAGMA optimize" if has_stats else "ANALYZE")
 
 
 def get_session() -> Iterator[Session]:
     with Session(engine) as session:
         yield session
+
+
+def get_ro_session() -> Iterator[Session]:
+    with Session(engine_ro) as session:
+        yield session
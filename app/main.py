@@ -3,41 +3,77 @@ from __future__ import annotations
 import os
 import pathlib
 import shutil
+import sys
 import uuid
 import asyncio
+from calendar import monthrange
 from datetime import date, datetime, timedelta
 from typing import Optional
-from urllib.request import urlopen
-from urllib.parse import urlencode
 
+import httpx
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import FastAPI, Request, Depends, Form, UploadFile, File, HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlmodel import select
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from pydantic import BaseModel, ValidationError, ValidationInfo, field_validator
+from sqlalchemy import delete
+from sqlmodel import Session, and_, func, or_, select
 
-from .db import init_db, get_session
+from .db import engine, engine_ro, init_db, get_session, get_ro_session, optimize_db
 from .models import Person, Pet, Child, Note
 from .utils import calc_age, compose_address, yandex_maps_url
 
 # === Приложение ===
 app = FastAPI(title="People Notebook")
+# HTML-страницы (кириллица) хорошо сжимаются; уровень 4 почти не грузит CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
 
 # Папка загрузок (персистентная)
 BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
 UPLOAD_DIR = pathlib.Path(os.environ.get("UPLOAD_DIR", "/data/uploads"))
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# Отдаём загруженные файлы
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
-# Шаблоны
-templates = Jinja2Templates(directory=str(BASE_DIR / "app" / "templates"))
+class UploadStaticFiles(StaticFiles):
+    # Имена загрузок — uuid, файл под именем никогда не меняется: кэшируем навсегда
+    def file_response(self, *args, **kwargs):
+        resp = super().file_response(*args, **kwargs)
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return resp
+
+
+# Отдаём загруженные файлы
+app.mount("/uploads", UploadStaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+
+# Шаблоны: без проверки mtime на каждый рендер, байткод кэшируется на диске
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(str(BASE_DIR / "app" / "templates")),
+        autoescape=True,
+        auto_reload=False,
+        cache_size=400,
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
+)
+TEMPLATE_NAMES = ("list.html", "detail.html", "form.html")
 
 # Telegram конфиг из ENV
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")  # токен бота
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")      # ваш чат/канал/группа (куда слать напоминания)
 
+# Фоновые задачи (проверка ДР, обслуживание БД)
+scheduler = AsyncIOScheduler()
+BIRTHDAY_CHECK_HOUR = 9
+
+# Общий асинхронный клиент: keep-alive соединение к api.telegram.org
+_tg_client = httpx.AsyncClient(timeout=10)
+
 
 def require_auth() -> bool:
     return True
@@ -46,114 +82,216 @@ def require_auth() -> bool:
 @app.on_event("startup")
 def _startup() -> None:
     init_db()
-    # Пускаем фонового «наблюдателя» ДР, если задан токен/чат
+    # Компилируем шаблоны заранее, а не на первом запросе
+    for name in TEMPLATE_NAMES:
+        templates.get_template(name)
+    # Раз в сутки обновляем статистику планировщика SQLite
+    scheduler.add_job(
+        optimize_db,
+        IntervalTrigger(hours=24),
+        id="sqlite_optimize",
+        replace_existing=True,
+        misfire_grace_time=None,
+    )
+    # Проверка ДР — каждый день в 09:00, если задан токен/чат
     if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-        asyncio.create_task(_birthday_watcher())
+        # Плюс сразу после старта: пропущенный из-за рестарта запуск не теряется,
+        # а повторы отсекаются маркерами notify_year_*
+        scheduler.add_job(
+            _run_birthday_check,
+            CronTrigger(hour=BIRTHDAY_CHECK_HOUR, minute=0),
+            id="birthday_check",
+            replace_existing=True,
+            # Без ограничения на опоздание: пропущенный день = потерянные напоминания
+            misfire_grace_time=None,
+            next_run_time=datetime.now(),
+        )
     else:
         # Просто инфо в лог — напоминалки выключены
         print("Telegram reminders disabled: set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID")
+    scheduler.start()
+
 
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    scheduler.shutdown(wait=False)
+    await _tg_client.aclose()
 
-def _safe_remove_file(path: Optional[str]) -> None:
-    if not path:
+
+def _safe_remove_file(name: Optional[str]) -> None:
+    # В БД хранится только имя файла в UPLOAD_DIR (uuid + расширение)
+    if not name:
+        return
+    # Только голое имя файла: никаких абсолютных путей и «..» за пределы UPLOAD_DIR
+    if pathlib.PurePath(name).name != name:
         return
-    if path.startswith("/uploads/"):
-        fs_path = UPLOAD_DIR / path.split("/uploads/", 1)[-1]
-        if fs_path.exists():
+    try:
+        (UPLOAD_DIR / name).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+UPLOAD_CHUNK = 1 << 20  # 1 МиБ вместо 16 КиБ по умолчанию у copyfileobj
+
+
+def _sendfile(in_fd: int, out_fd: int) -> None:
+    size = os.fstat(in_fd).st_size
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+        if not sent:
+            break
+        offset += sent
+
+
+def _save_upload(upload: UploadFile) -> str:
+    ext = pathlib.Path(upload.filename).suffix.lower()
+    filename = f"{uuid.uuid4().hex}{ext}"
+    dest = UPLOAD_DIR / filename
+    src = upload.file
+    with dest.open("wb") as f:
+        # Крупный файл (больше лимита спула Starlette) уже лежит на диске —
+        # на Linux копируем его в ядре через sendfile, как это делает shutil
+        if sys.platform.startswith("linux") and (upload.size or 0) > UPLOAD_CHUNK:
             try:
-                fs_path.unlink()
-            except Exception:
-                pass
+                _sendfile(src.fileno(), f.fileno())
+                return filename
+            except OSError:
+                f.seek(0)
+                f.truncate()
+        src.seek(0)
+        shutil.copyfileobj(src, f, UPLOAD_CHUNK)
+    return filename
+
+
+# Чтение для рендера — Core-запросы без ORM: шаблонам хватает Row
+# (доступ p.first_name работает так же). Своё соединение на каждый вызов:
+# их нельзя делить между тредами
+def _read_first(stmt):
+    with engine_ro.connect() as conn:
+        return conn.execute(stmt).first()
+
+
+def _read_all(stmt):
+    with engine_ro.connect() as conn:
+        return conn.execute(stmt).all()
 
 
 # ===== Телеграм уведомления
 
-def _send_telegram(text: str) -> None:
+async def _send_telegram(text: str) -> None:
     if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
         return
     api = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = urlencode({"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}).encode()
+    data = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}
     try:
-        with urlopen(api, data=data, timeout=10) as resp:
-            resp.read()
+        resp = await _tg_client.post(api, data=data)
+        resp.raise_for_status()
     except Exception as e:
         print("Telegram send error:", e)
 
 
 def _safe_date(year: int, month: int, day: int) -> date:
     # Корректируем невалидные даты (напр. 30.02 -> 28.02)
-    while True:
-        try:
-            return date(year, month, day)
-        except ValueError:
-            day -= 1
-            if day <= 0:
-                # fallback
-                return date(year, month, 1)
-
-
-async def _birthday_watcher():
-    # Простая проверка каждые 12 часов
-    await asyncio.sleep(3)  # небольшая задержка после старта
-    while True:
-        try:
-            async for _ in _check_birthdays_and_notify():
-                pass
-        except Exception as e:
-            print("Birthday watcher error:", e)
-        await asyncio.sleep(60 * 60 * 12)  # 12 часов
+    return date(year, month, min(day, monthrange(year, month)[1]))
+
+
+def _birthday_on(target: date, notified_col, year: int):
+    # Условие «ДР приходится на target и напоминание в этом году не отправлено».
+    # Если target — последний день месяца, подходят и «несуществующие» даты
+    # (напр. 29.02 в невисокосный год), как в _safe_date
+    day_cond = Person.birth_day == target.day
+    if target.day == monthrange(target.year, target.month)[1]:
+        day_cond = Person.birth_day >= target.day
+    return and_(
+        Person.birth_month == target.month,
+        day_cond,
+        or_(notified_col.is_(None), notified_col != year),
+    )
 
 
-async def _check_birthdays_and_notify():
-    # Отдельная функция — удобнее тестировать
-    from .db import get_session  # локальный импорт, чтобы не зацикливать
-    from fastapi import Depends
+async def _run_birthday_check():
+    try:
+        async for _ in _check_birthdays_and_notify():
+            pass
+    except Exception as e:
+        print("Birthday watcher error:", e)
 
-    # Открываем синхронную сессию в текущем треде
-    for session in get_session():
+
+def _collect_birthday_reminders() -> list[str]:
+    # Синхронная часть: выборка и отметки notify_year_* (выполняется в треде)
+    with Session(engine) as session:
         today = date.today()
-        people = session.exec(select(Person)).all()
+        target_7 = today + timedelta(days=7)
+        target_1 = today + timedelta(days=1)
+        # Отбираем кандидатов в SQL (индекс по месяцу/дню), а не всю таблицу
+        people = session.exec(
+            select(Person).where(
+                or_(
+                    _birthday_on(target_7, Person.notify_year_7d, today.year),
+                    _birthday_on(target_1, Person.notify_year_1d, today.year),
+                )
+            )
+        ).all()
+        messages = []
         for p in people:
-            if not (p.birth_day and p.birth_month):
-                continue
-
-            # Определяем ближайший ДР
-            year = today.year
-            bday = _safe_date(year, p.birth_month, p.birth_day)
-            if bday < today:
-                bday = _safe_date(year + 1, p.birth_month, p.birth_day)
-
-            days_left = (bday - today).days
-
             # 7 дней
-            if days_left == 7 and p.notify_year_7d != today.year:
+            if _safe_date(target_7.year, p.birth_month, p.birth_day) == target_7 and p.notify_year_7d != today.year:
                 text = f"🎉 Через 7 дней День Рождения у {p.first_name or ''} {p.last_name or ''} — {p.birth_day:02d}.{p.birth_month:02d}{'.'+str(p.birth_year) if p.birth_year else ''}"
-                _send_telegram(text)
+                messages.append(text)
                 p.notify_year_7d = today.year
                 session.add(p)
 
             # 1 день
-            if days_left == 1 and p.notify_year_1d != today.year:
+            if _safe_date(target_1.year, p.birth_month, p.birth_day) == target_1 and p.notify_year_1d != today.year:
                 text = f"🎂 Завтра ДР у {p.first_name or ''} {p.last_name or ''}! {p.birth_day:02d}.{p.birth_month:02d}{'.'+str(p.birth_year) if p.birth_year else ''}"
-                _send_telegram(text)
+                messages.append(text)
                 p.notify_year_1d = today.year
                 session.add(p)
 
         session.commit()
-        yield True
+    return messages
+
+
+async def _check_birthdays_and_notify():
+    # Отдельная функция — удобнее тестировать.
+    # Работа с БД — в треде, чтобы не блокировать цикл событий; соединение
+    # возвращается в пул до отправки сообщений
+    messages = await asyncio.to_thread(_collect_birthday_reminders)
+    # Все напоминания за один проход — параллельно
+    await asyncio.gather(*(_send_telegram(text) for text in messages))
+    yield True
 
 
 # ===== Главная (список людей)
 
+# Только то, что выводит list.html
+LIST_COLUMNS = (
+    Person.id,
+    Person.first_name,
+    Person.last_name,
+    Person.phone,
+    Person.email,
+    Person.city,
+    Person.birth_day,
+    Person.birth_month,
+    Person.birth_year,
+    Person.avatar_path,
+)
+
 @app.get("/")
-def people_list(request: Request, session=Depends(get_session)):
-    people = session.exec(select(Person)).all()
-    people_sorted = sorted(
-        people, key=lambda p: ((p.last_name or "").lower(), (p.first_name or "").lower())
-    )
+def people_list(request: Request, session=Depends(get_ro_session)):
+    people = session.exec(
+        select(*LIST_COLUMNS).order_by(
+            func.unicode_lower(Person.last_name), func.unicode_lower(Person.first_name)
+        )
+    ).all()
+    # Возраст считаем здесь, один date.today() на запрос, а не в цикле шаблона
+    today = date.today()
+    rows = [(p, calc_age(p.birth_day, p.birth_month, p.birth_year, today)) for p in people]
     resp = templates.TemplateResponse(
         "list.html",
-        {"request": request, "people": people_sorted, "calc_age": calc_age},
+        {"request": request, "people": rows},
     )
     resp.headers["Cache-Control"] = "no-store"
     return resp
@@ -166,85 +304,85 @@ def person_new(request: Request):
     return templates.TemplateResponse("form.html", {"request": request, "p": None})
 
 
-@app.post("/person/create")
-def create_person(
+# Соцсети: ник без ведущего @
+USERNAME_FIELDS = ("telegram_username", "instagram_username", "vk_username")
+
+
+class PersonForm(BaseModel):
     # базовые
-    first_name: Optional[str] = Form(None),
-    last_name: Optional[str] = Form(None),
-    phone: Optional[str] = Form(None),
-    email: Optional[str] = Form(None),
-    city: Optional[str] = Form(None),
-    address: Optional[str] = Form(None),
-    apartment: Optional[str] = Form(None),
-    birth_day: Optional[int] = Form(None),
-    birth_month: Optional[int] = Form(None),
-    birth_year: Optional[int] = Form(None),
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    city: Optional[str] = None
+    address: Optional[str] = None
+    apartment: Optional[str] = None
+    birth_day: Optional[int] = None
+    birth_month: Optional[int] = None
+    birth_year: Optional[int] = None
     # любимое/личное
-    favorite_movies: Optional[str] = Form(None),
-    favorite_color: Optional[str] = Form(None),
-    favorite_flowers: Optional[str] = Form(None),
-    marital_status: Optional[str] = Form(None),
-    partner_name: Optional[str] = Form(None),
-    handedness: Optional[str] = Form(None),
-    smokes: Optional[str] = Form(None),
-    # аватар
-    avatar: UploadFile | None = File(None),
-    # новые поля
-    food_prefs: Optional[str] = Form(None),
-    alcohol_prefs: Optional[str] = Form(None),
-    places_to_go: Optional[str] = Form(None),
-    traits_positive: Optional[str] = Form(None),
-    traits_negative: Optional[str] = Form(None),
-    workplace: Optional[str] = Form(None),
-    job_title: Optional[str] = Form(None),
-    wishlist: Optional[str] = Form(None),
-    telegram_username: Optional[str] = Form(None),
-    instagram_username: Optional[str] = Form(None),
-    vk_username: Optional[str] = Form(None),
+    favorite_movies: Optional[str] = None
+    favorite_color: Optional[str] = None
+    favorite_flowers: Optional[str] = None
+    marital_status: Optional[str] = None
+    partner_name: Optional[str] = None
+    handedness: Optional[str] = None
+    smokes: Optional[bool] = None
+    # предпочтения, характер, работа
+    food_prefs: Optional[str] = None
+    alcohol_prefs: Optional[str] = None
+    places_to_go: Optional[str] = None
+    traits_positive: Optional[str] = None
+    traits_negative: Optional[str] = None
+    workplace: Optional[str] = None
+    job_title: Optional[str] = None
+    wishlist: Optional[str] = None
+    # соцсети
+    telegram_username: Optional[str] = None
+    instagram_username: Optional[str] = None
+    vk_username: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _normalize(cls, v, info: ValidationInfo):
+        # Пустое значение формы -> None для любого поля
+        if info.field_name in USERNAME_FIELDS:
+            v = (v or "").lstrip("@")
+        elif info.field_name == "smokes":
+            return (v == "1") if v else None
+        return v or None
+
+    @field_validator("*")
+    @classmethod
+    def _zero_to_none(cls, v):
+        # 0 в числовых полях (день/месяц/год) — тоже «не указано»
+        return None if type(v) is int and not v else v
+
+    @classmethod
+    async def as_form(cls, request: Request) -> PersonForm:
+        # Форма разбирается один раз, валидация — одним проходом модели
+        form = await request.form()
+        try:
+            return cls.model_validate({k: form.get(k) for k in cls.model_fields})
+        except ValidationError as e:
+            # Как у параметров Form(): loc начинается с "body"
+            raise RequestValidationError(
+                [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+            )
+
 
+@app.post("/person/create")
+def create_person(
+    data: PersonForm = Depends(PersonForm.as_form),
+    avatar: UploadFile | None = File(None),
     auth_ok: bool = Depends(require_auth),
     session=Depends(get_session),
 ):
     avatar_path = None
     if avatar and avatar.filename:
-        ext = pathlib.Path(avatar.filename).suffix.lower()
-        filename = f"{uuid.uuid4().hex}{ext}"
-        dest = UPLOAD_DIR / filename
-        with dest.open("wb") as f:
-            shutil.copyfileobj(avatar.file, f)
-        avatar_path = f"/uploads/{filename}"
-
-    p = Person(
-        first_name=first_name or None,
-        last_name=last_name or None,
-        phone=phone or None,
-        email=email or None,
-        city=city or None,
-        address=address or None,
-        apartment=apartment or None,
-        birth_day=birth_day or None,
-        birth_month=birth_month or None,
-        birth_year=birth_year or None,
-        favorite_movies=favorite_movies or None,
-        favorite_color=favorite_color or None,
-        favorite_flowers=favorite_flowers or None,
-        marital_status=marital_status or None,
-        partner_name=partner_name or None,
-        handedness=handedness or None,
-        smokes=(smokes == "1") if smokes is not None else None,
-        avatar_path=avatar_path,
-        food_prefs=food_prefs or None,
-        alcohol_prefs=alcohol_prefs or None,
-        places_to_go=places_to_go or None,
-        traits_positive=traits_positive or None,
-        traits_negative=traits_negative or None,
-        workplace=workplace or None,
-        job_title=job_title or None,
-        wishlist=wishlist or None,
-        telegram_username=(telegram_username or "").lstrip("@") or None,
-        instagram_username=(instagram_username or "").lstrip("@") or None,
-        vk_username=(vk_username or "").lstrip("@") or None,
-    )
+        avatar_path = _save_upload(avatar)
+
+    p = Person(**data.model_dump(), avatar_path=avatar_path)
     session.add(p)
     session.commit()
     session.refresh(p)
@@ -262,37 +400,8 @@ def person_edit(pid: int, request: Request, session=Depends(get_session)):
 @app.post("/person/{pid}/update")
 def update_person(
     pid: int,
-    first_name: Optional[str] = Form(None),
-    last_name: Optional[str] = Form(None),
-    phone: Optional[str] = Form(None),
-    email: Optional[str] = Form(None),
-    city: Optional[str] = Form(None),
-    address: Optional[str] = Form(None),
-    apartment: Optional[str] = Form(None),
-    birth_day: Optional[int] = Form(None),
-    birth_month: Optional[int] = Form(None),
-    birth_year: Optional[int] = Form(None),
-    favorite_movies: Optional[str] = Form(None),
-    favorite_color: Optional[str] = Form(None),
-    favorite_flowers: Optional[str] = Form(None),
-    marital_status: Optional[str] = Form(None),
-    partner_name: Optional[str] = Form(None),
-    handedness: Optional[str] = Form(None),
-    smokes: Optional[str] = Form(None),
+    data: PersonForm = Depends(PersonForm.as_form),
     avatar: UploadFile | None = File(None),
-
-    food_prefs: Optional[str] = Form(None),
-    alcohol_prefs: Optional[str] = Form(None),
-    places_to_go: Optional[str] = Form(None),
-    traits_positive: Optional[str] = Form(None),
-    traits_negative: Optional[str] = Form(None),
-    workplace: Optional[str] = Form(None),
-    job_title: Optional[str] = Form(None),
-    wishlist: Optional[str] = Form(None),
-    telegram_username: Optional[str] = Form(None),
-    instagram_username: Optional[str] = Form(None),
-    vk_username: Optional[str] = Form(None),
-
     auth_ok: bool = Depends(require_auth),
     session=Depends(get_session),
 ):
@@ -300,45 +409,12 @@ def update_person(
     if not p:
         raise HTTPException(status_code=404, detail="Person not found")
 
-    p.first_name = first_name or None
-    p.last_name = last_name or None
-    p.phone = phone or None
-    p.email = email or None
-    p.city = city or None
-    p.address = address or None
-    p.apartment = apartment or None
-    p.birth_day = birth_day or None
-    p.birth_month = birth_month or None
-    p.birth_year = birth_year or None
-
-    p.favorite_movies = favorite_movies or None
-    p.favorite_color = favorite_color or None
-    p.favorite_flowers = favorite_flowers or None
-    p.marital_status = marital_status or None
-    p.partner_name = partner_name or None
-    p.handedness = handedness or None
-    p.smokes = (smokes == "1") if smokes is not None else None
+    for k, v in data.model_dump().items():
+        setattr(p, k, v)
 
     if avatar and avatar.filename:
         _safe_remove_file(p.avatar_path)
-        ext = pathlib.Path(avatar.filename).suffix.lower()
-        filename = f"{uuid.uuid4().hex}{ext}"
-        dest = UPLOAD_DIR / filename
-        with dest.open("wb") as f:
-            shutil.copyfileobj(avatar.file, f)
-        p.avatar_path = f"/uploads/{filename}"
-
-    p.food_prefs = food_prefs or None
-    p.alcohol_prefs = alcohol_prefs or None
-    p.places_to_go = places_to_go or None
-    p.traits_positive = traits_positive or None
-    p.traits_negative = traits_negative or None
-    p.workplace = workplace or None
-    p.job_title = job_title or None
-    p.wishlist = wishlist or None
-    p.telegram_username = (telegram_username or "").lstrip("@") or None
-    p.instagram_username = (instagram_username or "").lstrip("@") or None
-    p.vk_username = (vk_username or "").lstrip("@") or None
+        p.avatar_path = _save_upload(avatar)
 
     session.add(p)
     session.commit()
@@ -353,19 +429,14 @@ def person_delete(pid: int, auth_ok: bool = Depends(require_auth), session=Depen
     if not p:
         return RedirectResponse(url="/", status_code=302)
 
-    pets = session.exec(select(Pet).where(Pet.person_id == pid)).all()
-    for pet in pets:
-        _safe_remove_file(pet.photo_path)
-        session.delete(pet)
-
-    children = session.exec(select(Child).where(Child.person_id == pid)).all()
-    for c in children:
-        session.delete(c)
-
-    notes = session.exec(select(Note).where(Note.person_id == pid)).all()
-    for n in notes:
-        session.delete(n)
+    # Пути к фото нужны для удаления файлов, сами строки сносим одним DELETE
+    photo_paths = session.exec(select(Pet.photo_path).where(Pet.person_id == pid)).all()
+    session.exec(delete(Pet).where(Pet.person_id == pid))
+    session.exec(delete(Child).where(Child.person_id == pid))
+    session.exec(delete(Note).where(Note.person_id == pid))
 
+    for photo_path in photo_paths:
+        _safe_remove_file(photo_path)
     _safe_remove_file(p.avatar_path)
 
     session.delete(p)
@@ -396,12 +467,7 @@ def pet_create(
 
     photo_path = None
     if photo and photo.filename:
-        ext = pathlib.Path(photo.filename).suffix.lower()
-        filename = f"{uuid.uuid4().hex}{ext}"
-        dest = UPLOAD_DIR / filename
-        with dest.open("wb") as f:
-            shutil.copyfileobj(photo.file, f)
-        photo_path = f"/uploads/{filename}"
+        photo_path = _save_upload(photo)
 
     pet = Pet(
         person_id=pid,
@@ -451,12 +517,7 @@ def pet_edit(
 
     if photo and photo.filename:
         _safe_remove_file(pet.photo_path)
-        ext = pathlib.Path(photo.filename).suffix.lower()
-        filename = f"{uuid.uuid4().hex}{ext}"
-        dest = UPLOAD_DIR / filename
-        with dest.open("wb") as f:
-            shutil.copyfileobj(photo.file, f)
-        pet.photo_path = f"/uploads/{filename}"
+        pet.photo_path = _save_upload(photo)
 
     session.add(pet)
     session.commit()
@@ -549,30 +610,45 @@ def child_delete(child_id: int, auth_ok: bool = Depends(require_auth), session=D
 # ===== Карточка
 
 @app.get("/person/{pid}")
-def person_detail(pid: int, request: Request, session=Depends(get_session)):
-    p = session.get(Person, pid)
+async def person_detail(pid: int, request: Request):
+    # Независимые чтения — параллельно в пуле потоков (WAL допускает много читателей)
+    p, pets, children, notes = await asyncio.gather(
+        asyncio.to_thread(_read_first, Person.__table__.select().where(Person.id == pid)),
+        asyncio.to_thread(
+            _read_all,
+            Pet.__table__.select().where(Pet.person_id == pid).order_by(Pet.species, Pet.name),
+        ),
+        asyncio.to_thread(
+            _read_all,
+            Child.__table__.select().where(Child.person_id == pid).order_by(
+                func.coalesce(Child.birth_year, 9999),
+                func.coalesce(Child.birth_month, 12),
+                func.coalesce(Child.birth_day, 31),
+            ),
+        ),
+        asyncio.to_thread(
+            _read_all,
+            Note.__table__.select().where(Note.person_id == pid).order_by(Note.created_at.desc(), Note.id),
+        ),
+    )
     if not p:
         raise HTTPException(status_code=404, detail="Person not found")
 
-    pets = session.exec(select(Pet).where(Pet.person_id == pid)).all()
-    children = session.exec(select(Child).where(Child.person_id == pid)).all()
-    notes = session.exec(select(Note).where(Note.person_id == pid)).all()
-
-    pets_sorted = sorted(pets, key=lambda x: (x.species or "", x.name or ""))
-    children_sorted = sorted(children, key=lambda c: (c.birth_year or 9999, c.birth_month or 12, c.birth_day or 31))
-    notes_sorted = sorted(notes, key=lambda n: n.created_at or 0, reverse=True)
-
     address_full = compose_address(p.city, p.address, p.apartment)
 
+    today = date.today()
+    age = calc_age(p.birth_day, p.birth_month, p.birth_year, today)
+    children = [(c, calc_age(c.birth_day, c.birth_month, c.birth_year, today)) for c in children]
+
     resp = templates.TemplateResponse(
         "detail.html",
         {
             "request": request,
             "p": p,
-            "pets": pets_sorted,
-            "children": children_sorted,
-            "notes": notes_sorted,
-            "calc_age": calc_age,
+            "pets": pets,
+            "children": children,
+            "notes": notes,
+            "age": age,
             "address_full": address_full,
             "yandex_maps_url": yandex_maps_url,
         },
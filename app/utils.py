@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 from datetime import date
+from functools import lru_cache
 from typing import Optional
 from urllib.parse import quote_plus
 
 
-def calc_age(d: Optional[int], m: Optional[int], y: Optional[int]) -> Optional[int]:
+def calc_age(
+    d: Optional[int], m: Optional[int], y: Optional[int], today: Optional[date] = None
+) -> Optional[int]:
     if not (d and m and y):
         return None
     try:
-        today = date.today()
+        if today is None:
+            today = date.today()
         bd = date(y, m, d)
         age = today.year - bd.year - ((today.month, today.day) < (bd.month, bd.day))
         return age
@@ -26,6 +30,7 @@ def compose_address(city: Optional[str], address: Optional[str], apartment: Opti
     return ", ".join(parts)
 
 
+@lru_cache(maxsize=1024)
 def yandex_maps_url(address_str: str) -> str:
     # Простая ссылока поиска по адресу
     q = quote_plus(address_str)